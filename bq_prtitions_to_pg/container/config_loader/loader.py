@@ -0,0 +1,76 @@
+"""
+Shared configuration loading module for BigQuery to PostgreSQL transfer
+"""
+from functools import lru_cache
+import json
+import yaml
+import os
+
+# Prefer the C-backed LibYAML loader when available; it parses the same
+# documents several times faster than the pure-Python SafeLoader
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@lru_cache(maxsize=32)
+def _load_yaml_cached(config_path, mtime_ns):
+    """Parse a YAML file; mtime_ns keys the cache entry so edits invalidate it"""
+    # Prefer the JSON sidecar written on a previous start; JSON parsing is an
+    # order of magnitude faster than YAML and the sidecar is only trusted
+    # while it is at least as new as the YAML file
+    json_path = config_path + '.json'
+    try:
+        if os.stat(json_path).st_mtime_ns >= mtime_ns:
+            with open(json_path, 'r') as file:
+                return json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.load(file, Loader=_YamlLoader)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Error parsing configuration file: {e}")
+
+    # Write the sidecar for the next start. Dump to a temp file and rename so
+    # a failed dump never leaves a partial sidecar newer than the YAML; skip
+    # silently on read-only mounts and on configs that aren't
+    # JSON-serializable (e.g. unquoted dates, which YAML parses to date
+    # objects)
+    tmp_path = json_path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as file:
+            json.dump(config, file)
+        os.replace(tmp_path, json_path)
+    except (TypeError, ValueError, OSError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return config
+
+
+def load_config(config_path="config/config.yaml"):
+    """
+    Load configuration from YAML file, reusing the parsed result until the
+    file changes on disk
+
+    Args:
+        config_path: Path to the YAML configuration file
+
+    Returns:
+        dict: Parsed configuration
+    """
+    # Resolve relative path to absolute path
+    if not os.path.isabs(config_path):
+        config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config_path)
+
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+
+    return _load_yaml_cached(config_path, mtime_ns)
@@ -3,30 +3,29 @@ GCP Clients initialization module for BigQuery to PostgreSQL transfer
 """
 from google.cloud import bigquery
 from google.cloud import storage
-import yaml
+from google.oauth2 import service_account
 import os
+import threading
+
+from config_loader.loader import load_config
 
 
 class GCPClients:
     def __init__(self, config_path="config/config.yaml"):
-        self.config = self._load_config(config_path)
+        self.config = load_config(config_path)
         self.bq_client = None
         self.gcs_client = None
-    
-    def _load_config(self, config_path):
-        """Load configuration from YAML file"""
-        try:
-            # Resolve relative path to absolute path
-            if not os.path.isabs(config_path):
-                config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config_path)
-            
-            with open(config_path, 'r') as file:
-                return yaml.safe_load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        except yaml.YAMLError as e:
-            raise ValueError(f"Error parsing configuration file: {e}")
-    
+        self._buckets = {}
+        self._credentials = {}
+
+    def _get_credentials(self, credentials_path):
+        """Load service account credentials, reusing them per key file"""
+        if credentials_path not in self._credentials:
+            self._credentials[credentials_path] = (
+                service_account.Credentials.from_service_account_file(credentials_path)
+            )
+        return self._credentials[credentials_path]
+
     def initialize_bigquery_client(self):
         """Initialize BigQuery client with service account"""
         try:
@@ -38,8 +37,9 @@ class GCPClients:
             
             if not os.path.exists(credentials_path):
                 raise FileNotFoundError(f"BigQuery service account file not found: {credentials_path}")
-            
-            self.bq_client = bigquery.Client.from_service_account_json(credentials_path)
+
+            credentials = self._get_credentials(credentials_path)
+            self.bq_client = bigquery.Client(credentials=credentials, project=credentials.project_id)
             return self.bq_client
         except Exception as e:
             raise Exception(f"Failed to initialize BigQuery client: {e}")
@@ -55,8 +55,9 @@ class GCPClients:
             
             if not os.path.exists(credentials_path):
                 raise FileNotFoundError(f"GCS service account file not found: {credentials_path}")
-            
-            self.gcs_client = storage.Client.from_service_account_json(credentials_path)
+
+            credentials = self._get_credentials(credentials_path)
+            self.gcs_client = storage.Client(credentials=credentials, project=credentials.project_id)
             return self.gcs_client
         except Exception as e:
             raise Exception(f"Failed to initialize GCS client: {e}")
@@ -81,6 +82,12 @@ class GCPClients:
             self.initialize_gcs_client()
         return self.gcs_client
     
+    def get_bucket(self, bucket_name):
+        """Get a GCS bucket handle, reusing one per bucket name"""
+        if bucket_name not in self._buckets:
+            self._buckets[bucket_name] = self.get_gcs_client().bucket(bucket_name)
+        return self._buckets[bucket_name]
+
     def get_config(self):
         """Get the loaded configuration"""
         return self.config
@@ -88,10 +95,14 @@ class GCPClients:
 
 # Singleton pattern for global client access
 _gcp_clients_instance = None
+_gcp_clients_lock = threading.Lock()
 
 def get_gcp_clients(config_path="config/config.yaml"):
     """Get singleton instance of GCPClients"""
     global _gcp_clients_instance
+    # Double-checked locking so parallel workers never build two instances
     if _gcp_clients_instance is None:
-        _gcp_clients_instance = GCPClients(config_path)
-    return _gcp_clients_instance 
\ No newline at end of file
+        with _gcp_clients_lock:
+            if _gcp_clients_instance is None:
+                _gcp_clients_instance = GCPClients(config_path)
+    return _gcp_clients_instance
\ No newline at end of file
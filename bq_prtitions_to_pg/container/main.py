@@ -1,9 +1,10 @@
 """
 Main script to orchestrate BigQuery to PostgreSQL partition transfer
 """
+import logging
 import sys
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 # Add current directory to path to import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -11,32 +12,39 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from scripts.export_bq_partitions_to_gcs import main as export_partitions
 from scripts.load_partitions_to_pg import main as load_partitions
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
 
 def main():
     """
     Main orchestration function for BigQuery to PostgreSQL partition transfer
     """
-    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
+    logger.info("Started")
+
+    # Pin to UTC and compute once, so a run that crosses a day boundary
+    # cannot disagree with itself about which partition is "yesterday"
+    yesterday = (datetime.now(tz=timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%d')
+
     try:
         # Step 1: Export BigQuery partitions to GCS
-        exported_tables = export_partitions()
-        
+        exported_tables = export_partitions(yesterday=yesterday)
+
         if not exported_tables:
-            print("No partitions to export")
+            logger.info("No partitions to export")
             return
-        
+
         # Step 2: Load partitions from GCS to PostgreSQL
         successful_files, failed_files = load_partitions()
-        
+
         # Summary
-        print(f"Completed: {len(successful_files)} loaded, {len(failed_files)} failed")
-        
+        logger.info("Completed: %s loaded, %s failed", len(successful_files), len(failed_files))
+
     except KeyboardInterrupt:
-        print("Interrupted")
+        logger.warning("Interrupted")
         return
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
         return
 
 
@@ -1,33 +1,25 @@
 """
 PostgreSQL Connection module for BigQuery to PostgreSQL transfer
 """
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import yaml
-import os
+from contextlib import contextmanager
+import logging
+import threading
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from config_loader.loader import load_config
+
+logger = logging.getLogger(__name__)
 
 
 class PostgreSQLConnection:
     def __init__(self, config_path="config/config.yaml"):
-        self.config = self._load_config(config_path)
-        self.pg_connection = None
-    
-    def _load_config(self, config_path):
-        """Load configuration from YAML file"""
-        try:
-            # Resolve relative path to absolute path
-            if not os.path.isabs(config_path):
-                config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config_path)
-            
-            with open(config_path, 'r') as file:
-                return yaml.safe_load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        except yaml.YAMLError as e:
-            raise ValueError(f"Error parsing configuration file: {e}")
-    
+        self.config = load_config(config_path)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
     def initialize_postgresql_connection(self):
-        """Initialize PostgreSQL connection"""
+        """Initialize PostgreSQL connection pool"""
         try:
             pg_config = self.config['postgresql']
             connection_params = {
@@ -37,59 +29,71 @@ class PostgreSQLConnection:
                 'user': pg_config['username'],
                 'password': pg_config['password']
             }
-            
+
             # Validate required parameters
             for key, value in connection_params.items():
                 if not value:
                     raise ValueError(f"PostgreSQL {key} is not configured")
-            
-            self.pg_connection = psycopg2.connect(**connection_params)
-            return self.pg_connection
+
+            self._pool = ThreadedConnectionPool(2, 16, **connection_params)
+            return self._pool
         except Exception as e:
-            raise Exception(f"Failed to initialize PostgreSQL connection: {e}")
-    
-    def get_postgresql_connection(self):
-        """Get PostgreSQL connection, initializing if needed"""
-        if not self.pg_connection or self.pg_connection.closed:
-            self.initialize_postgresql_connection()
-        return self.pg_connection
-    
-    def get_postgresql_cursor(self, dict_cursor=True):
-        """Get PostgreSQL cursor with optional dictionary cursor"""
-        connection = self.get_postgresql_connection()
-        if dict_cursor:
-            return connection.cursor(cursor_factory=RealDictCursor)
-        return connection.cursor()
-    
+            raise Exception(f"Failed to initialize PostgreSQL connection pool: {e}")
+
+    def get_connection_pool(self):
+        """Get PostgreSQL connection pool, initializing if needed"""
+        # Double-checked locking: the first acquire() may come from several
+        # loader threads at once
+        if self._pool is None or self._pool.closed:
+            with self._pool_lock:
+                if self._pool is None or self._pool.closed:
+                    self.initialize_postgresql_connection()
+        return self._pool
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection from the pool for the duration of the block"""
+        pool = self.get_connection_pool()
+        connection = pool.getconn()
+        try:
+            yield connection
+        finally:
+            pool.putconn(connection)
+
     def close_postgresql_connection(self):
-        """Close PostgreSQL connection"""
-        if self.pg_connection and not self.pg_connection.closed:
-            self.pg_connection.close()
-            self.pg_connection = None
-    
+        """Close all pooled PostgreSQL connections"""
+        if self._pool and not self._pool.closed:
+            self._pool.closeall()
+            self._pool = None
+
     def get_config(self):
         """Get the loaded configuration"""
         return self.config
-    
+
     def test_connection(self):
         """Test PostgreSQL connection"""
         try:
-            cursor = self.get_postgresql_cursor()
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
-            cursor.close()
+            with self.acquire() as connection:
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                cursor.close()
             return True
         except Exception as e:
-            print(f"PostgreSQL connection test failed: {e}")
+            logger.error("PostgreSQL connection test failed: %s", e)
             return False
 
 
 # Singleton pattern for global client access
 _postgresql_connection_instance = None
+_postgresql_connection_lock = threading.Lock()
 
 def get_postgresql_connection(config_path="config/config.yaml"):
     """Get singleton instance of PostgreSQLConnection"""
     global _postgresql_connection_instance
+    # Double-checked locking so parallel workers never build two instances
     if _postgresql_connection_instance is None:
-        _postgresql_connection_instance = PostgreSQLConnection(config_path)
-    return _postgresql_connection_instance 
\ No newline at end of file
+        with _postgresql_connection_lock:
+            if _postgresql_connection_instance is None:
+                _postgresql_connection_instance = PostgreSQLConnection(config_path)
+    return _postgresql_connection_instance
\ No newline at end of file
@@ -2,55 +2,49 @@
 Script to check for yesterday's partitions in BigQuery tables and export to GCS
 """
 from google.cloud import bigquery
-from google.cloud import storage
 from google.api_core.exceptions import NotFound, Forbidden, GoogleAPIError
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import logging
 import sys
 import os
-import pandas as pd
 
 # Add parent directory to path to import our modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gcp_clients.clients import get_gcp_clients
 
+logger = logging.getLogger(__name__)
 
-def list_partitioned_tables(bq_client, dataset_id):
+
+def get_partition_fields(bq_client, full_dataset_id):
     """
-    List all partitioned tables in a BigQuery dataset
-    
+    Get the partitioning field of every partitioned table with a single query
+
     Args:
         bq_client: BigQuery client instance
-        dataset_id: Dataset ID to check
-        
+        full_dataset_id: Full dataset ID (project.dataset)
+
     Returns:
-        list: List of partitioned table IDs
+        dict: Mapping of partitioned table name to its partitioning field
     """
+    query = f"""
+    SELECT table_name, column_name
+    FROM `{full_dataset_id}.INFORMATION_SCHEMA.COLUMNS`
+    WHERE is_partitioning_column = 'YES'
+    """
+
     try:
-        dataset_ref = bq_client.dataset(dataset_id)
-        tables = bq_client.list_tables(dataset_ref)
-        partitioned_tables = []
-
-        for table in tables:
-            try:
-                table_ref = bq_client.get_table(table.reference)
-                if table_ref.time_partitioning or table_ref.range_partitioning:
-                    partitioned_tables.append(table.table_id)
-            except NotFound:
-                print(f"✗ Table {table.table_id} not found.")
-            except Forbidden:
-                print(f"✗ Access to table {table.table_id} is forbidden.")
-
-        return partitioned_tables
+        result = bq_client.query(query).result()
+        return {row.table_name: row.column_name for row in result}
     except NotFound:
-        print(f"✗ Dataset {dataset_id} not found.")
-        return []
+        logger.error("Dataset %s not found.", full_dataset_id)
     except Forbidden:
-        print(f"✗ Access to dataset {dataset_id} is forbidden.")
-        return []
+        logger.error("Access to dataset %s is forbidden.", full_dataset_id)
     except GoogleAPIError as e:
-        print(f"✗ An error occurred: {e}")
-        return []
+        logger.error("An error occurred: %s", e)
+
+    return {}
 
 
 def check_for_yesterdays_partition(bq_client, table, full_dataset_id, yesterday):
@@ -71,236 +65,218 @@ def check_for_yesterdays_partition(bq_client, table, full_dataset_id, yesterday)
     query = f"""
     SELECT MAX(partition_id) as max_partition_id
     FROM `{full_dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
-    WHERE table_name = '{table}'
+    WHERE table_name = @table_name
     """
-    
+
+    # Parameterizing keeps the query text stable across tables, so BigQuery
+    # can serve repeats from its query cache instead of re-planning
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter('table_name', 'STRING', table)],
+        use_query_cache=True
+    )
+
     try:
-        query_job = bq_client.query(query)
-        result = query_job.result()
-        partition_id = next(result, None).max_partition_id if result.total_rows > 0 else None
-        
+        # One paginated fetch; inspecting total_rows before iterating cost an
+        # extra round trip for the row-count metadata
+        rows = list(bq_client.query(query, job_config=job_config).result(max_results=1))
+        partition_id = rows[0].max_partition_id if rows else None
+
         if partition_id == new_partition:
             return partition_id
         else:
             return None
             
     except bigquery.exceptions.BigQueryError as e:
-        print(f"✗ BigQuery error processing table {table}: {e}")
+        logger.error("BigQuery error processing table %s: %s", table, e)
     except Exception as e:
-        print(f"✗ Unexpected error processing table {table}: {e}")
+        logger.error("Unexpected error processing table %s: %s", table, e)
 
     return None
 
 
-def get_yesterday_date():
-    """Get yesterday's date in YYYY-MM-DD format"""
-    yesterday = datetime.now() - timedelta(days=1)
-    return yesterday.strftime('%Y-%m-%d')
-
-
-def get_partitioning_field(client, table, dataset_id):
+def get_latest_partitions(bq_client, full_dataset_id, tables):
     """
-    Get the partitioning field for a BigQuery table
-    
+    Get the latest partition ID for a set of tables with a single query
+
     Args:
-        client: BigQuery client instance
-        table: Table ID
-        dataset_id: Dataset ID
-        
+        bq_client: BigQuery client instance
+        full_dataset_id: Full dataset ID (project.dataset)
+        tables: List of table IDs to check
+
     Returns:
-        str or None: Partitioning field name if found, None otherwise
+        dict: Mapping of table name to its latest partition ID
     """
-    table_id = f'{dataset_id}.{table}'
+    query = f"""
+    SELECT table_name, MAX(partition_id) as max_partition_id
+    FROM `{full_dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+    WHERE table_name IN UNNEST(@tables)
+    GROUP BY table_name
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter('tables', 'STRING', list(tables))],
+        use_query_cache=True
+    )
+
     try:
-        bq_table = client.get_table(table_id)
-        if bq_table.time_partitioning:
-            return bq_table.time_partitioning.field
-        elif bq_table.range_partitioning:
-            return bq_table.range_partitioning.field
-        else:
-            return None
-    except bigquery.NotFound as e:
-        print(f"✗ Table {table_id} not found: {e}")
-        return None
-    except bigquery.Forbidden as e:
-        print(f"✗ Access to table {table_id} is forbidden: {e}")
-        return None
-    except bigquery.GoogleCloudError as e:
-        print(f"✗ Google Cloud error accessing table {table_id}: {e}")
-        return None
+        result = bq_client.query(query, job_config=job_config).result()
+        return {row.table_name: row.max_partition_id for row in result}
+    except GoogleAPIError as e:
+        logger.error("BigQuery error fetching latest partitions: %s", e)
     except Exception as e:
-        print(f"✗ Unexpected error getting partitioning field for table {table_id}: {e}")
-        return None
+        logger.error("Unexpected error fetching latest partitions: %s", e)
+
+    return {}
 
 
-def export_partition_to_csv(bucket_name, storage_client, bq_client, dataset_id, table, 
-                           partition_field, partition_id, yesterday, destination_uri, location="us-west1"):
+def get_yesterday_date():
+    """Get yesterday's date (UTC) in YYYY-MM-DD format"""
+    yesterday = datetime.now(tz=timezone.utc) - timedelta(days=1)
+    return yesterday.strftime('%Y-%m-%d')
+
+
+def export_partition_to_gcs(bq_client, dataset_id, table, partition_id, destination_uri,
+                            export_format='CSV'):
     """
-    Export a BigQuery partition to GCS as CSV
-    
+    Export a BigQuery partition to GCS via a server-side extract job
+
     Args:
-        bucket_name: GCS bucket name
-        storage_client: GCS client instance
         bq_client: BigQuery client instance
-        dataset_id: Dataset ID
+        dataset_id: Full dataset ID (project.dataset)
         table: Table ID
-        partition_field: Partitioning field name
         partition_id: Partition ID (e.g., '20240114')
-        yesterday: Yesterday's date in YYYY-MM-DD format
         destination_uri: Base destination URI
-        location: GCS location (default: us-west1)
-    """
-    destination_uri = f'{destination_uri}/{table}_{partition_id}.csv'
-    blob_name = f'processing_zone/{table}_{partition_id}.csv'
-
-    query = f"""
-    SELECT *
-    FROM `{dataset_id}.{table}`
-    WHERE `{partition_field}` = '{yesterday}'
+        export_format: 'CSV' for gzipped CSV (default) or 'PARQUET'
     """
+    if export_format == 'PARQUET':
+        # Parquet keeps numeric columns binary end to end, sparing the
+        # loader the CSV text-parsing tax
+        destination_uri = f'{destination_uri}/{table}_{partition_id}.parquet'
+        job_config = bigquery.ExtractJobConfig(destination_format='PARQUET')
+    else:
+        # GZIP roughly halves the bytes the loader later pulls from GCS
+        destination_uri = f'{destination_uri}/{table}_{partition_id}.csv.gz'
+        job_config = bigquery.ExtractJobConfig(
+            destination_format='CSV',
+            compression='GZIP',
+            print_header=True
+        )
 
     try:
-        # Execute query and get results
-        query_job = bq_client.query(query)
-        results = query_job.result()
-        
-        # Convert to DataFrame
-        df = results.to_dataframe()
-        
-        if df.empty:
-            return False
-        
-        # Upload to GCS
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        
-        # Convert DataFrame to CSV and upload
-        csv_data = df.to_csv(index=False)
-        blob.upload_from_string(csv_data, content_type='text/csv')
-        
+        # Address the partition directly with a decorator and let BigQuery
+        # stream it to GCS; no partition bytes transit the container. The job
+        # location is left unset so the service infers it from the source
+        # table, which an extract job must match anyway
+        source = bigquery.TableReference.from_string(f'{dataset_id}.{table}${partition_id}')
+
+        extract_job = bq_client.extract_table(
+            source,
+            destination_uri,
+            job_config=job_config
+        )
+        extract_job.result()
+
         return True
-        
+
     except GoogleAPIError as e:
-        print(f"✗ Error exporting table {table} due to a Google Cloud error: {e}")
+        logger.error("Error exporting table %s due to a Google Cloud error: %s", table, e)
         return False
     except Exception as e:
-        print(f"✗ General error exporting table {table}: {e}")
+        logger.error("General error exporting table %s: %s", table, e)
         return False
 
 
-def export_all_new_partitions_to_gcs():
+def export_all_new_partitions_to_gcs(yesterday=None):
     """
-    Export all new partitions (yesterday's partitions) to GCS as CSV files
+    Export all new partitions (yesterday's partitions) to GCS
+
+    Args:
+        yesterday: Yesterday's date in YYYY-MM-DD format; derived from the
+                   current UTC time when not supplied
     """
     try:
         # Get GCP clients
         gcp_clients = get_gcp_clients()
         bq_client = gcp_clients.get_bigquery_client()
-        gcs_client = gcp_clients.get_gcs_client()
         config = gcp_clients.get_config()
-        
+
         # Get configuration
         project_id = config['bigquery']['project_id']
         dataset_id = config['bigquery']['dataset_id']
         bucket_name = config['gcs']['bucket_name']
         
         if not project_id or not dataset_id or not bucket_name:
-            print("✗ Project ID, Dataset ID, or Bucket Name not configured in config.yaml")
+            logger.error("Project ID, Dataset ID, or Bucket Name not configured in config.yaml")
             return []
         
         full_dataset_id = f"{project_id}.{dataset_id}"
-        yesterday = get_yesterday_date()
+        yesterday = yesterday or get_yesterday_date()
         partition_id = yesterday.replace('-', '')
-        
-        # List partitioned tables
-        partitioned_tables = list_partitioned_tables(bq_client, dataset_id)
-        
+        export_format = config.get('transfer', {}).get('export_format', 'CSV')
+
+        # One query replaces list_tables plus a get_table round trip per table
+        partition_field_by_table = get_partition_fields(bq_client, full_dataset_id)
+        partitioned_tables = sorted(partition_field_by_table)
+
         if not partitioned_tables:
             return []
-        
-        # Check which tables have yesterday's partition and export them
+
+        # One batched query replaces a per-table INFORMATION_SCHEMA job
+        latest_partitions = get_latest_partitions(bq_client, full_dataset_id, partitioned_tables)
+
+        def process_table(table):
+            """Resolve the partition field and export a single table"""
+            # Check if yesterday's partition exists
+            if latest_partitions.get(table) != partition_id:
+                return None
+
+            # Get partitioning field
+            partition_field = partition_field_by_table.get(table)
+
+            if not partition_field:
+                return False
+
+            # Export to GCS
+            destination_uri = f"gs://{bucket_name}/processing_zone"
+            return export_partition_to_gcs(
+                bq_client=bq_client,
+                dataset_id=full_dataset_id,
+                table=table,
+                partition_id=partition_id,
+                destination_uri=destination_uri,
+                export_format=export_format
+            )
+
+        # Check which tables have yesterday's partition and export them;
+        # each table blocks on BigQuery/GCS round trips, so run them in parallel
+        max_workers = config.get('transfer', {}).get('max_workers', 8)
         exported_tables = []
         failed_tables = []
-        
-        for table in partitioned_tables:
-            # Check if yesterday's partition exists
-            partition_exists = check_for_yesterdays_partition(bq_client, table, full_dataset_id, yesterday)
-            
-            if partition_exists:
-                # Get partitioning field
-                partition_field = get_partitioning_field(bq_client, table, dataset_id)
-                
-                if partition_field:
-                    # Export to GCS
-                    destination_uri = f"gs://{bucket_name}/processing_zone"
-                    success = export_partition_to_csv(
-                        bucket_name=bucket_name,
-                        storage_client=gcs_client,
-                        bq_client=bq_client,
-                        dataset_id=full_dataset_id,
-                        table=table,
-                        partition_field=partition_field,
-                        partition_id=partition_id,
-                        yesterday=yesterday,
-                        destination_uri=destination_uri
-                    )
-                    
-                    if success:
-                        exported_tables.append(table)
-                    else:
-                        failed_tables.append(table)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for table, result in zip(partitioned_tables, executor.map(process_table, partitioned_tables)):
+                if result is None:
+                    continue
+                if result:
+                    exported_tables.append(table)
                 else:
                     failed_tables.append(table)
-        
+
         return exported_tables
         
     except Exception as e:
-        print(f"✗ Error in export_all_new_partitions_to_gcs: {e}")
+        logger.error("Error in export_all_new_partitions_to_gcs: %s", e)
         return []
 
 
-def main():
-    """Main function to check yesterday's partitions and optionally export to GCS"""
+def main(yesterday=None):
+    """Main function to export yesterday's partitions to GCS"""
     try:
-        # Get GCP clients
-        gcp_clients = get_gcp_clients()
-        bq_client = gcp_clients.get_bigquery_client()
-        config = gcp_clients.get_config()
-        
-        # Get configuration
-        project_id = config['bigquery']['project_id']
-        dataset_id = config['bigquery']['dataset_id']
-        
-        if not project_id or not dataset_id:
-            print("✗ Project ID or Dataset ID not configured in config.yaml")
-            return []
-        
-        full_dataset_id = f"{project_id}.{dataset_id}"
-        yesterday = get_yesterday_date()
-        
-        # List partitioned tables
-        partitioned_tables = list_partitioned_tables(bq_client, dataset_id)
-        
-        if not partitioned_tables:
-            return []
-        
-        # Check each table for yesterday's partition
-        tables_with_yesterday_partition = []
-        
-        for table in partitioned_tables:
-            partition_id = check_for_yesterdays_partition(bq_client, table, full_dataset_id, yesterday)
-            if partition_id:
-                tables_with_yesterday_partition.append(table)
-        
-        # Export to GCS if tables have partitions
-        if tables_with_yesterday_partition:
-            exported_tables = export_all_new_partitions_to_gcs()
-            return exported_tables
-        
-        return tables_with_yesterday_partition
-        
+        exported_tables = export_all_new_partitions_to_gcs(yesterday=yesterday)
+        return exported_tables
+
     except Exception as e:
-        print(f"✗ Error in main function: {e}")
+        logger.error("Error in main function: %s", e)
         return []
 
 
@@ -1,9 +1,12 @@
 """
 Script to load partitions from GCS processing_zone to PostgreSQL
 """
-from google.cloud import storage
 import pandas as pd
-from io import BytesIO
+from psycopg2 import sql
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import gzip
+import logging
 import os
 import sys
 from datetime import datetime
@@ -14,153 +17,175 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gcp_clients.clients import get_gcp_clients
 from postgresql_conn.pg_conn import get_postgresql_connection
 
+logger = logging.getLogger(__name__)
 
-def get_gcs_files_in_processing_zone(bucket_name, storage_client):
+
+def get_gcs_files_in_processing_zone(bucket):
     """
-    Get list of CSV files in processing_zone folder
-    
+    Get list of exported partition files in processing_zone folder
+
     Args:
-        bucket_name: GCS bucket name
-        storage_client: GCS client instance
-        
+        bucket: GCS bucket handle
+
     Returns:
         list: List of file names in processing_zone
     """
     try:
-        bucket = storage_client.bucket(bucket_name)
         blobs = bucket.list_blobs(prefix='processing_zone/')
         
-        # Filter for CSV files only
-        csv_files = [blob.name.replace('processing_zone/', '') for blob in blobs 
-                    if blob.name.endswith('.csv') and blob.name.startswith('processing_zone/')]
-        
-        return csv_files
+        # Filter for exported partition files (CSV, gzipped CSV, or Parquet)
+        data_files = [blob.name.replace('processing_zone/', '') for blob in blobs
+                     if blob.name.endswith(('.csv', '.csv.gz', '.parquet')) and blob.name.startswith('processing_zone/')]
+
+        return data_files
         
     except Exception as e:
-        print(f"✗ Error getting files from processing_zone: {e}")
+        logger.error("Error getting files from processing_zone: %s", e)
         return []
 
 
-def move_file_in_gcs(bucket_name, storage_client, source_blob_name, destination_blob_name):
+def move_file_in_gcs(bucket, source_blob_name, destination_blob_name):
     """
     Move a file within GCS bucket
-    
+
     Args:
-        bucket_name: GCS bucket name
-        storage_client: GCS client instance
+        bucket: GCS bucket handle
         source_blob_name: Source blob name
         destination_blob_name: Destination blob name
-        
+
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        bucket = storage_client.bucket(bucket_name)
-        source_blob = bucket.blob(source_blob_name)
-        destination_blob = bucket.blob(destination_blob_name)
-        
-        # Copy to new location
-        bucket.copy_blob(source_blob, bucket, destination_blob_name)
-        
-        # Delete from original location
-        source_blob.delete()
-        
+        source_blob = bucket.get_blob(source_blob_name)
+
+        # Server-side rename is a single GCS operation instead of copy+delete;
+        # the generation precondition refuses to move a blob that changed (or
+        # was already moved) since we listed it
+        bucket.rename_blob(
+            source_blob,
+            destination_blob_name,
+            if_source_generation_match=source_blob.generation
+        )
+
         return True
-        
+
     except Exception as e:
-        print(f"✗ Error moving file {source_blob_name}: {e}")
+        logger.error("Error moving file %s: %s", source_blob_name, e)
         return False
 
 
-def delete_file_from_gcs(bucket_name, storage_client, blob_name):
+def delete_file_from_gcs(bucket, blob_name):
     """
     Delete a file from GCS
-    
+
     Args:
-        bucket_name: GCS bucket name
-        storage_client: GCS client instance
+        bucket: GCS bucket handle
         blob_name: Blob name to delete
-        
+
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
         blob.delete()
         
         return True
         
     except Exception as e:
-        print(f"✗ Error deleting file {blob_name}: {e}")
+        logger.error("Error deleting file %s: %s", blob_name, e)
         return False
 
 
+@lru_cache(maxsize=1024)
 def extract_table_name_from_filename(file_name):
     """
-    Extract table name from CSV filename
-    
+    Extract table name from a partition filename
+
     Args:
-        file_name: CSV filename (e.g., 'user_events_20240114.csv')
-        
+        file_name: Partition filename (e.g., 'user_events_20240114.csv.gz')
+
     Returns:
         str: Table name (e.g., 'user_events')
     """
-    # Remove .csv extension
-    table, _ = os.path.splitext(file_name)
-    
-    # Split by underscore and join first two parts
-    table_name_parts = table.split('_')
-    table_name = "_".join(table_name_parts[:2])
-    
-    return table_name
+    # Everything before the last underscore is the table name, which also
+    # handles table names containing more than one underscore
+    return file_name.rsplit('_', 1)[0]
 
 
-def load_partition_to_postgresql(bucket_name, storage_client, file_name, pg_connection, table_name):
+def load_partition_to_postgresql(bucket, file_name, pg_connection, table_name):
     """
-    Load a single partition CSV file to PostgreSQL
-    
+    Load a single partition file to PostgreSQL
+
     Args:
-        bucket_name: GCS bucket name
-        storage_client: GCS client instance
-        file_name: CSV file name
+        bucket: GCS bucket handle
+        file_name: Partition file name
         pg_connection: PostgreSQL connection
         table_name: Target table name
-        
+
     Returns:
         bool: True if successful, False otherwise
     """
     try:
         # Download file from GCS
-        bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(f'processing_zone/{file_name}')
         
-        buffer = BytesIO()
-        blob.download_to_file(buffer)
-        buffer.seek(0)
-        
-        # Read CSV into DataFrame
-        df = pd.read_csv(buffer)
-        
-        # Convert column names to lowercase
-        df.columns = [c.lower() for c in df.columns]
-        
-        # Load to PostgreSQL
-        if_exists = 'replace' if table_name == 'partitioned_table3' else 'append'
-        
-        df.to_sql(
-            name=table_name,
-            con=pg_connection,
-            schema='public',
-            chunksize=5000,
-            index=False,
-            if_exists=if_exists
-        )
-        
+        # Stream the blob instead of buffering the whole file in memory, so
+        # memory use stays bounded by the reader's chunk size
+        with blob.open('rb') as raw:
+            if file_name.endswith('.parquet'):
+                # Binary COPY preserves column types and skips CSV text
+                # parsing entirely; pyarrow and pgcopy are only required
+                # when transfer.export_format is PARQUET
+                import pyarrow.parquet as pq
+                from pgcopy import CopyManager
+
+                arrow_table = pq.read_table(raw)
+                columns = [name.lower() for name in arrow_table.column_names]
+                rows = zip(*(column.to_pylist() for column in arrow_table.columns))
+
+                CopyManager(pg_connection, f'public.{table_name}', columns).copy(rows)
+                pg_connection.commit()
+
+                return True
+
+            # Transparently decompress gzip exports on the fly
+            src = gzip.GzipFile(fileobj=raw) if file_name.endswith('.gz') else raw
+            if table_name == 'partitioned_table3':
+                # Replace mode still goes through pandas so the table schema
+                # gets recreated from the CSV
+                df = pd.read_csv(src)
+                df.columns = [c.lower() for c in df.columns]
+                df.to_sql(
+                    name=table_name,
+                    con=pg_connection,
+                    schema='public',
+                    chunksize=5000,
+                    index=False,
+                    if_exists='replace'
+                )
+            else:
+                # Consume just the header line to build a lowercased column
+                # list; the remaining bytes stream through COPY untouched, so
+                # no DataFrame is materialized just to rename columns
+                header = src.readline().decode('utf-8').strip()
+                columns = [sql.Identifier(name.strip('"').lower()) for name in header.split(',')]
+
+                # COPY streams the CSV straight into the table, avoiding
+                # per-row INSERT overhead
+                copy_sql = sql.SQL("COPY public.{} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                    sql.Identifier(table_name),
+                    sql.SQL(', ').join(columns)
+                )
+                with pg_connection.cursor() as cursor:
+                    cursor.copy_expert(copy_sql, src)
+                pg_connection.commit()
+
         return True
-        
+
     except Exception as e:
-        print(f"✗ Error loading {file_name}: {e}")
+        logger.error("Error loading %s: %s", file_name, e)
+        pg_connection.rollback()
         return False
 
 
@@ -171,75 +196,76 @@ def load_all_partitions_to_postgresql():
     try:
         # Get GCP clients
         gcp_clients = get_gcp_clients()
-        gcs_client = gcp_clients.get_gcs_client()
         config = gcp_clients.get_config()
         
-        # Get PostgreSQL connection
+        # Get PostgreSQL connection pool
         pg_client = get_postgresql_connection()
-        pg_connection = pg_client.get_postgresql_connection()
-        
+
         # Get configuration
         bucket_name = config['gcs']['bucket_name']
         
         if not bucket_name:
-            print("✗ Bucket Name not configured in config.yaml")
+            logger.error("Bucket Name not configured in config.yaml")
             return [], []
-        
+
+        # Resolve the bucket handle once and share it across workers
+        bucket = gcp_clients.get_bucket(bucket_name)
+
         # Get list of files in processing_zone
-        gcs_files = get_gcs_files_in_processing_zone(bucket_name, gcs_client)
+        gcs_files = get_gcs_files_in_processing_zone(bucket)
         
         if not gcs_files:
             return [], []
         
-        # Process each file
-        successful_files = []
-        failed_files = []
-        
-        for file_name in gcs_files:
+        def process_file(file_name):
+            """Load a single file on its own pooled connection and archive it"""
             table_name = extract_table_name_from_filename(file_name)
-            
+
             # Try to load the partition
-            success = load_partition_to_postgresql(
-                bucket_name=bucket_name,
-                storage_client=gcs_client,
-                file_name=file_name,
-                pg_connection=pg_connection,
-                table_name=table_name
-            )
-            
+            with pg_client.acquire() as pg_connection:
+                success = load_partition_to_postgresql(
+                    bucket=bucket,
+                    file_name=file_name,
+                    pg_connection=pg_connection,
+                    table_name=table_name
+                )
+
             if success:
                 # Remove from processing_zone (successful load)
-                delete_success = delete_file_from_gcs(
-                    bucket_name=bucket_name,
-                    storage_client=gcs_client,
+                return delete_file_from_gcs(
+                    bucket=bucket,
                     blob_name=f'processing_zone/{file_name}'
                 )
-                
-                if delete_success:
+
+            # Move to unprocess_zone (failed load)
+            move_success = move_file_in_gcs(
+                bucket=bucket,
+                source_blob_name=f'processing_zone/{file_name}',
+                destination_blob_name=f'unprocess_zone/{file_name}'
+            )
+
+            return False if move_success else None
+
+        # Each file blocks on GCS download and PostgreSQL round trips, so load
+        # them in parallel on connections borrowed from the pool
+        max_workers = config.get('transfer', {}).get('max_workers', 8)
+        successful_files = []
+        failed_files = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for file_name, result in zip(gcs_files, executor.map(process_file, gcs_files)):
+                if result:
                     successful_files.append(file_name)
-                else:
-                    failed_files.append(file_name)
-            else:
-                # Move to unprocess_zone (failed load)
-                move_success = move_file_in_gcs(
-                    bucket_name=bucket_name,
-                    storage_client=gcs_client,
-                    source_blob_name=f'processing_zone/{file_name}',
-                    destination_blob_name=f'unprocess_zone/{file_name}'
-                )
-                
-                if move_success:
+                elif result is False:
                     failed_files.append(file_name)
-        
+
         return successful_files, failed_files
-        
+
     except Exception as e:
-        print(f"✗ Error in load_all_partitions_to_postgresql: {e}")
+        logger.error("Error in load_all_partitions_to_postgresql: %s", e)
         return [], []
     finally:
-        # Close PostgreSQL connection
-        if 'pg_connection' in locals():
-            pg_connection.close()
+        # Close all pooled PostgreSQL connections
         if 'pg_client' in locals():
             pg_client.close_postgresql_connection()
 